@@ -1,15 +1,18 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree, html
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 import pandas as pd
+import hashlib
+import json
 import logging
+import random
+import re
 import sys
 import os
+import threading
 import time
 from tabulate import tabulate
 
@@ -22,63 +25,106 @@ logging.basicConfig(
     ]
 )
 
-def setup_driver():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument("--disable-popup-blocking")
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.set_page_load_timeout(30)
-        return driver
-    except Exception as e:
-        logging.error(f"Failed to initialize Chrome driver: {str(e)}")
-        raise
+BASE_URL = "https://www.shl.com/products/product-catalog/"
+PAGE_SIZE = 12
+OUTPUT_COLUMNS = ['id', 'assessment_name', 'url', 'remote_testing', 'adaptive_irt_support', 'test_type']
+# Pages are independent (?start=12*k), so they are fetched concurrently;
+# keep the per-host connection count polite.
+MAX_WORKERS = 8
 
-def wait_for_element(driver, by, selector, timeout=20, retries=3):
-    for attempt in range(retries):
-        try:
-            element = WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located((by, selector))
-            )
-            return element
-        except TimeoutException:
-            if attempt == retries - 1:
-                raise
-            logging.warning(f"Timeout waiting for element {selector}. Attempt {attempt + 1} of {retries}")
-            time.sleep(2)
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# The catalog listing is plain server-rendered HTML, so one XPath over the
+# parsed document yields every product row across both catalog tables.
+ROW_PATH = '//div[contains(@class, "custom__table-wrapper")]//tr[@data-course-id or @data-entity-id]'
+ROW_XPATH = etree.XPath(ROW_PATH)
+# Yes/no columns are resolved for the whole page at once: each query returns
+# the rows whose column holds a "-yes" circle, checked by set membership.
+YES_CIRCLE_PATH = '*[contains(@class, "catalogue__circle") and contains(@class, "-yes")]'
+REMOTE_ROWS_XPATH = etree.XPath(f'{ROW_PATH}[td[2]//{YES_CIRCLE_PATH}]')
+ADAPTIVE_ROWS_XPATH = etree.XPath(f'{ROW_PATH}[td[3]//{YES_CIRCLE_PATH}]')
+# Per-row selectors, compiled once instead of re-parsed for every row
+NAME_LINK_XPATH = etree.XPath('./td//a')
+# Plain strings (no smart_strings) so memoized results don't pin page trees
+TEST_KEYS_XPATH = etree.XPath(
+    './td[contains(@class, "product-catalogue__keys")]'
+    '//span[contains(@class, "product-catalogue__key")]/text()',
+    smart_strings=False
+)
+TEST_TYPE_CELL_XPATH = etree.XPath('./td[4]')
+NEXT_PAGE_XPATH = etree.XPath(
+    '//li[contains(@class, "pagination__item") and contains(@class, "-next")]/a[@href]'
+)
+PAGINATION_HREF_XPATH = etree.XPath(
+    '//li[contains(@class, "pagination__item")]/a/@href'
+)
+START_PARAM_RE = re.compile(r"[?&]start=(\d+)")
+
+_thread_local = threading.local()
+_sessions = []
+_sessions_lock = threading.Lock()
 
+def setup_session():
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    # Retry transient failures with short exponential backoff (0.5s, 1s, 2s)
+    # and honour Retry-After, rather than sleeping a fixed interval.
+    retries = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session():
+    # One keep-alive session per worker thread; requests.Session is not thread-safe.
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = setup_session()
+        _thread_local.session = session
+        with _sessions_lock:
+            _sessions.append(session)
+    return session
+
+def close_sessions():
+    with _sessions_lock:
+        while _sessions:
+            _sessions.pop().close()
+
+@lru_cache(maxsize=4096)
 def clean_text(text):
     if not text:
         return ""
     return " ".join(text.strip().split())
 
-def get_yes_no_status(row, position):
-    try:
-        row.find_element(By.CSS_SELECTOR, f"td:nth-child({position}) .catalogue__circle.-yes")
-        return True
-    except NoSuchElementException:
-        return False
+@lru_cache(maxsize=1024)
+def join_test_codes(codes):
+    return ", ".join(sorted(set(codes)))
 
 def get_test_codes(row):
     try:
         # Try to get codes as badges, fallback to text
-        codes = [clean_text(key.text) for key in row.find_elements(
-            By.CSS_SELECTOR, "td.product-catalogue__keys .product-catalogue__key")]
+        codes = [clean_text(key) for key in TEST_KEYS_XPATH(row)]
         if not codes:
             # fallback: split by lines in the 4th column
-            text = row.find_element(By.CSS_SELECTOR, "td:nth-child(4)").text
+            cells = TEST_TYPE_CELL_XPATH(row)
+            text = cells[0].text_content() if cells else ""
             codes = [clean_text(t) for t in text.splitlines() if t.strip()]
-        valid_codes = [code for code in codes if code]
-        return ", ".join(sorted(set(valid_codes))) if valid_codes else "N/A"
+        valid_codes = tuple(code for code in codes if code)
+        return join_test_codes(valid_codes) if valid_codes else "N/A"
     except Exception as e:
         logging.warning(f"Error getting test codes: {str(e)}")
         return "N/A"
 
+@lru_cache(maxsize=4096)
 def standardize_url(url):
     if not url:
         return ""
@@ -87,112 +133,255 @@ def standardize_url(url):
         url = f"https://www.shl.com{url}"
     return url
 
-def scrape_page(driver, url, page_num):
+def page_url(page_num):
+    return f"{BASE_URL}?start={(page_num-1)*PAGE_SIZE}" if page_num > 1 else BASE_URL
+
+# Returned by fetch_page when the server answers 304 for a cached page
+NOT_MODIFIED = object()
+
+def fetch_page(session, page_num, http_cache=None):
+    url = page_url(page_num)
+    headers = {}
+    validators = http_cache.get(url) if http_cache is not None else None
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    try:
+        response = session.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return NOT_MODIFIED
+        response.raise_for_status()
+        tree = html.fromstring(response.content)
+    except (requests.RequestException, etree.LxmlError) as e:
+        # An empty or unparseable body only costs this page, not the whole crawl
+        logging.error(f"Failed to scrape page {page_num}: {str(e)}")
+        return None
+    if http_cache is not None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            # has_next lets a later 304 for this page still answer the pagination check
+            http_cache[url] = {"etag": etag, "last_modified": last_modified,
+                               "has_next": tree_has_next(tree)}
+    return tree
+
+def tree_has_next(tree):
+    # A page without product rows ends the catalog whatever its pagination says
+    return bool(NEXT_PAGE_XPATH(tree)) and bool(ROW_XPATH(tree))
+
+def page_has_next(tree, page_num, http_cache=None):
+    if tree is NOT_MODIFIED:
+        # Sidecars written before has_next was recorded fall back to probing
+        return (http_cache or {}).get(page_url(page_num), {}).get("has_next", True)
+    return tree is not None and tree_has_next(tree)
+
+def get_last_page(tree):
+    starts = [int(m.group(1)) for href in PAGINATION_HREF_XPATH(tree)
+              for m in [START_PARAM_RE.search(href)] if m]
+    return max(starts, default=0) // PAGE_SIZE + 1
+
+def parse_products(tree, page_num, known_ids=frozenset()):
     products = []
-    max_retries = 3
-    for attempt in range(max_retries):
+    # lxml hands back the same element proxies while the rows list holds them,
+    # so membership in these sets identifies the row
+    rows = ROW_XPATH(tree)
+    remote_rows = set(REMOTE_ROWS_XPATH(tree))
+    adaptive_rows = set(ADAPTIVE_ROWS_XPATH(tree))
+    for row in rows:
+        row_id = row.get("data-course-id") or row.get("data-entity-id")
+        if not row_id:
+            # Without an ID the row can't be matched against the CSV and would
+            # be appended again on every run
+            logging.warning(f"Skipping row without an ID on page {page_num}")
+            continue
+        # Rows already in the CSV are dropped before any per-cell extraction
+        if row_id in known_ids:
+            continue
         try:
-            driver.get(url)
-            wait_for_element(driver, By.CSS_SELECTOR, "div.custom__table-wrapper table")
-            tables = driver.find_elements(By.CSS_SELECTOR, "div.custom__table-wrapper table")
-            for table in tables:
-                rows = table.find_elements(By.CSS_SELECTOR, "tr[data-course-id], tr[data-entity-id]")
-                for row in rows:
-                    try:
-                        name_element = row.find_element(By.CSS_SELECTOR, "td a")
-                        product_data = {
-                            "page": page_num,
-                            "assessment_name": clean_text(name_element.text),
-                            "url": standardize_url(name_element.get_attribute('href')),
-                            "remote_testing": get_yes_no_status(row, 2),
-                            "adaptive_irt_support": get_yes_no_status(row, 3),
-                            "test_type": get_test_codes(row),
-                            "id": row.get_attribute("data-course-id") or row.get_attribute("data-entity-id")
-                        }
-                        products.append(product_data)
-                    except Exception as e:
-                        logging.warning(f"Error processing row on page {page_num}: {str(e)}")
-                        continue
-            return products
-        except (TimeoutException, WebDriverException) as e:
-            if attempt == max_retries - 1:
-                logging.error(f"Failed to scrape page {page_num} after {max_retries} attempts: {str(e)}")
-                return []
-            logging.warning(f"Retrying page {page_num}. Attempt {attempt + 1} of {max_retries}")
-            time.sleep(5)
+            name_element = NAME_LINK_XPATH(row)[0]
+            product_data = {
+                "page": page_num,
+                "assessment_name": clean_text(name_element.text_content()),
+                "url": standardize_url(name_element.get('href')),
+                "remote_testing": row in remote_rows,
+                "adaptive_irt_support": row in adaptive_rows,
+                "test_type": get_test_codes(row),
+                "id": row_id
+            }
+            products.append(product_data)
+        except Exception as e:
+            logging.warning(f"Error processing row on page {page_num}: {str(e)}")
+            continue
     return products
 
+def scrape_page(page_num, http_cache=None, known_ids=frozenset()):
+    # Small jitter so the workers don't hit the server in lockstep
+    time.sleep(random.uniform(0, 0.2))
+    logging.info(f"Scraping page {page_num}...")
+    tree = fetch_page(get_session(), page_num, http_cache)
+    has_next = page_has_next(tree, page_num, http_cache)
+    if tree is NOT_MODIFIED:
+        # Unchanged since the last saved run, so every product on it is known
+        logging.info(f"Page {page_num} not modified. Skipping.")
+        return [], has_next
+    return (parse_products(tree, page_num, known_ids) if tree is not None else []), has_next
+
+def load_existing_ids(output_file):
+    if not os.path.exists(output_file):
+        return set()
+    id_df = pd.read_csv(output_file, usecols=lambda col: col == 'id', dtype=str)
+    # Blank id cells read back as NaN; keep only real IDs, as strings like the
+    # str(prod['id']) values added during a run
+    return set(id_df['id'].dropna().astype(str)) if 'id' in id_df.columns else set()
+
+def http_cache_path(output_file):
+    return f"{os.path.splitext(output_file)[0]}_http_cache.json"
+
+def csv_fingerprint(output_file, ids):
+    # Identifies the exact CSV the validators were saved against, so a CSV
+    # restored by git checkout or by hand invalidates them
+    stat = os.stat(output_file)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "ids": len(ids),
+        "ids_sha256": hashlib.sha256("\n".join(sorted(str(i) for i in ids)).encode()).hexdigest(),
+    }
+
+def load_http_cache(cache_file):
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable HTTP cache {cache_file}: {str(e)}")
+        return {}
+
+def save_http_cache(cache_file, http_cache):
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    with open(cache_file, "w") as f:
+        json.dump(http_cache, f, indent=2, sort_keys=True)
+
+def load_existing_df(output_file):
+    return pd.read_csv(output_file, dtype=str) if os.path.exists(output_file) else None
+
+def load_preview_df(output_file, rows=5):
+    return pd.read_csv(output_file, dtype=str, nrows=rows) if os.path.exists(output_file) else None
+
+def save_new_products(output_file, new_df):
+    # Append only the new rows when the file already has the expected header;
+    # a missing file or an older column layout gets a full rewrite instead
+    if os.path.exists(output_file):
+        if list(pd.read_csv(output_file, nrows=0).columns) == OUTPUT_COLUMNS:
+            new_df.to_csv(output_file, mode='a', header=False, index=False)
+            return
+        existing_df = load_existing_df(output_file)
+        new_df = pd.concat([existing_df.reindex(columns=OUTPUT_COLUMNS), new_df], ignore_index=True)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    new_df.to_csv(output_file, index=False)
+
+# Returns a preview (first few rows) of the saved catalog rather than the whole
+# table, so incremental runs never have to parse the full CSV
 def scrape_all_shl_products():
-    driver = None
     products = []
-    base_url = "https://www.shl.com/products/product-catalog/"
     output_file = "data/shl_catalog_all.csv"
-    existing_ids = set()
-    existing_df = None
 
-    # Step 1: Load existing data if file exists
-    if os.path.exists(output_file):
-        existing_df = pd.read_csv(output_file, dtype=str)
-        if 'id' in existing_df.columns:
-            existing_ids = set(existing_df['id'].astype(str))
-        else:
-            existing_ids = set()
-    else:
-        existing_ids = set()
+    # Step 1: Load existing IDs if file exists; only the id column is read
+    existing_ids = load_existing_ids(output_file)
+    # Read-only snapshot shared with the worker threads
+    known_ids = frozenset(existing_ids)
+    # Per-page ETag/Last-Modified validators from the last saved run. They are
+    # only trusted while the CSV is exactly the one they were saved with.
+    cache_file = http_cache_path(output_file)
+    http_cache = load_http_cache(cache_file) if existing_ids else {}
+    if http_cache and http_cache.get("csv_fingerprint") != csv_fingerprint(output_file, existing_ids):
+        logging.info("HTTP cache does not match the catalog CSV. Ignoring it.")
+        http_cache = {}
+    page_validators = http_cache.setdefault("pages", {})
+    if "last_page" not in http_cache:
+        # A 304 on page 1 is only usable if we know the page count it implies
+        page_validators.pop(page_url(1), None)
 
     try:
-        driver = setup_driver()
-        page = 1
-        while True:
-            logging.info(f"Scraping page {page}...")
-            url = f"{base_url}?start={(page-1)*12}" if page > 1 else base_url
-            page_products = scrape_page(driver, url, page)
-            if not page_products:
-                logging.info(f"No products found on page {page}. Assuming end of catalog.")
-                break
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            scrape = partial(scrape_page, http_cache=page_validators, known_ids=known_ids)
+            # Page 1 doubles as the pagination probe for the last page number. While
+            # it loads, start on the page count seen by the last run. Every fetch,
+            # page 1 included, goes through the pool to stay within MAX_WORKERS.
+            logging.info("Scraping page 1...")
+            first_future = executor.submit(lambda: fetch_page(get_session(), 1, page_validators))
+            page_futures = {page: executor.submit(scrape, page)
+                            for page in range(2, http_cache.get("last_page", 1) + 1)}
+            first_page = first_future.result()
+            if first_page is None:
+                raise RuntimeError("Could not load the first catalog page")
+            if first_page is NOT_MODIFIED:
+                logging.info("Page 1 not modified. Skipping.")
+                last_page = http_cache["last_page"]
+                first_products = []
+            else:
+                last_page = get_last_page(first_page)
+                first_products = parse_products(first_page, 1, known_ids)
+            page_results = {1: (first_products, page_has_next(first_page, 1, page_validators))}
+            logging.info(f"Catalog has {last_page} pages")
+            for page in range(2, last_page + 1):
+                if page not in page_futures:
+                    page_futures[page] = executor.submit(scrape, page)
+            for page in range(2, last_page + 1):
+                page_results[page] = page_futures[page].result()
+
+            # The pagination may only link a window of pages; keep following "next"
+            # from the last page until the catalog really ends
+            while page_results[last_page][1]:
+                last_page += 1
+                logging.info(f"Page {last_page - 1} links further pages. Probing page {last_page}...")
+                future = page_futures.get(last_page) or executor.submit(scrape, last_page)
+                page_results[last_page] = future.result()
+            page_results = [page_results[page][0] for page in range(1, last_page + 1)]
+
+        # Prefetched pages past the catalog's end are ignored. The pool has let
+        # them finish; drop their validators so a later 304 can't skip them for good.
+        catalog_urls = {page_url(page) for page in range(1, last_page + 1)}
+        for url in [url for url in page_validators if url not in catalog_urls]:
+            del page_validators[url]
+
+        for page_products in page_results:
             # Step 2: Filter out products with IDs already in CSV
             new_products = [prod for prod in page_products if str(prod['id']) not in existing_ids]
-            if not new_products:
-                logging.info(f"All products on page {page} already exist. Stopping incremental scrape.")
-                break
             products.extend(new_products)
             # Add new IDs to the set to avoid duplicates in the same run
             existing_ids.update(str(prod['id']) for prod in new_products)
-            try:
-                next_button = driver.find_element(By.CSS_SELECTOR, "li.pagination__item.-arrow.-next a")
-                if not next_button.is_displayed() or not next_button.is_enabled():
-                    break
-                page += 1
-                time.sleep(2)
-            except NoSuchElementException:
-                break
 
         # Step 3: Combine with existing data and save
         if products:
-            new_df = pd.DataFrame(products)
-            if existing_df is not None:
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            else:
-                combined_df = new_df
-            combined_df = combined_df.drop_duplicates(subset=["id"], keep='first')
-            combined_df = combined_df.sort_values(by=["assessment_name"]).reset_index(drop=True)
-            combined_df = combined_df[['id', 'assessment_name', 'url', 'remote_testing', 'adaptive_irt_support', 'test_type']]
-            os.makedirs("data", exist_ok=True)
-            combined_df.to_csv(output_file, index=False)
-            logging.info(f"Successfully added {len(new_df)} new products. Total: {len(combined_df)}")
+            # IDs were deduplicated against existing_ids while filtering, so new
+            # rows can be appended without touching the existing ones
+            new_df = pd.DataFrame(products, columns=OUTPUT_COLUMNS)
+            save_new_products(output_file, new_df)
+            preview_df = load_preview_df(output_file)
+            # existing_ids now holds every ID in the CSV, new ones included
+            logging.info(f"Successfully added {len(new_df)} new products. Total: {len(existing_ids)}")
             print("\nFirst few rows of the table (pandas DataFrame):")
-            print(combined_df.head())
-            print(tabulate(combined_df.head(), headers='keys', tablefmt='psql'))
-            return combined_df
+            print(preview_df)
+            print(tabulate(preview_df, headers='keys', tablefmt='psql'))
         else:
             logging.info("No new products found to add.")
-            return existing_df if existing_df is not None else None
+            preview_df = load_preview_df(output_file)
+
+        # Validators are saved only after the CSV holds every product they vouch for
+        if os.path.exists(output_file):
+            http_cache["last_page"] = last_page
+            http_cache["csv_fingerprint"] = csv_fingerprint(output_file, existing_ids)
+            save_http_cache(cache_file, http_cache)
+        return preview_df
     except Exception as e:
         logging.error(f"Scraping failed: {str(e)}")
         raise
     finally:
-        if driver:
-            driver.quit()
+        close_sessions()
 
 if __name__ == "__main__":
     try: